@@ -17,6 +17,7 @@ import requests
 
 # import private packages
 from exception import API_caller_Exception
+import instrumentation
 
 
 TF_YN = {True: "yes", False: "no"} # True or False to "yes" or "no"
@@ -56,7 +57,9 @@ class API_caller:
         output:
             the response from the API
         """
-        self._response = requests.get(self._url+url_modifier, headers=self._headers, params=self._params|updateparm)
+        url = self._url+url_modifier
+        with instrumentation.http_call(url) as call:
+            self._response = call.record(requests.get(url, headers=self._headers, params=self._params|updateparm))
         # check the status code
         if self._response.status_code != 200:
             # !! TODO: clarify according to the error code and / or message
@@ -71,7 +74,8 @@ class API_caller:
         """*get the json dict from the API*
         """
         self.get_response(url_modifier, updateparm)
-        return self._response.json()
+        with instrumentation.span("json_parse", source=url_modifier):
+            return self._response.json()
 
 
 class weather_API(API_caller):
@@ -120,7 +124,8 @@ class weather_API(API_caller):
         url_modifier = "current.json"
         updateparm = {"q": self._location, "aqi": TF_YN[aqi]}
         self._response = self.get_response(url_modifier, updateparm)
-        return self._response.json()
+        with instrumentation.span("json_parse", source=url_modifier):
+            return self._response.json()
 
     def get_forecast(self, days: int = 3, aqi: bool = True, alerts: bool = True) -> dict:
         """*get the forecast*
@@ -136,7 +141,8 @@ class weather_API(API_caller):
         url_modifier = "forecast.json"
         updateparm = {"q": self._location, "days": days, "aqi": TF_YN[aqi], "alerts": TF_YN[alerts]}
         self._response = self.get_response(url_modifier, updateparm)
-        return self._response.json()
+        with instrumentation.span("json_parse", source=url_modifier):
+            return self._response.json()
 
     def show_current_weather_information(self, aqi: bool = True) -> None:
         """*show the current weather information*
@@ -0,0 +1,491 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+""" benchmark
+    opyright (C) 2025 Hao HUANG
+    Resume of file :
+        In this file, we define the benchmark suite of the hot paths.
+        The Binance and weatherapi payloads are synthetic fixtures with the structure of the real responses,
+        served by a local stub HTTP server, and the Boursorama exports are generated into a temporary folder data.
+        Recorded fixtures (real responses and a real Boursorama export) are benchmarked as well when they are
+        found in the folder bench_fixtures. They are recorded with --record, which needs network access,
+        the weather API key of settings.py and an export in the folder data. No recorded fixture is shipped.
+        For each benchmark, the duration per call (median and minimum over samples of at least 50 ms, after warm-up,
+        taken in rounds over all the benchmarks), the throughput and the peak memory (tracemalloc) are measured.
+        The results can be saved as a baseline, and compared to a baseline to detect the regressions:
+        the median duration (scaled by the machine speed) and the peak memory are compared, with a relative
+        threshold, a tolerance of the measured noise (MAD) and absolute noise floors.
+        Before the benchmarks, it is checked that closing the shared snapshots does not unmap the views still in use.
+
+        usage:
+            python benchmark.py --record
+            python benchmark.py --save baseline.json
+            python benchmark.py --compare baseline.json --threshold 0.25
+"""
+############################################################################
+
+# import public packages
+import os
+import io
+import gc
+import sys
+import json
+import time
+import logging
+import argparse
+import warnings
+import shutil
+import tempfile
+import threading
+import contextlib
+import statistics
+import multiprocessing
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# import third-party packages
+import numpy as np
+import requests
+
+# import private packages
+import API_caller
+import crypto_caller
+import stock_analysis
+import shared_snapshot
+from exception import shared_snapshot_Exception
+
+
+BENCH_STOCK = "BENCH"
+TICKER_SIZES = [100, 2000]
+KLINE_SIZES = [100, 500, 1000]
+PRICE_SIZE = 2500
+RECORDED_STOCK = "RECORDED"
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_fixtures")
+# recorded fixture file -> route of the stub server
+RECORDED_ROUTES = {
+    "binance_ticker.json": "/recorded/ticker",
+    "binance_klines.json": "/recorded/klines",
+    "weather_current.json": "/recorded/weather/current.json",
+    "weather_forecast.json": "/recorded/weather/forecast.json",
+}
+RECORDED_EXPORT = "boursorama.txt"
+# measure: calls before timing, minimum duration of a sample, calls measured with tracemalloc
+WARMUP_CALLS = 3
+MIN_SAMPLE_S = 0.05
+PEAK_CALLS = 3
+# compare: differences below these noise floors, or below MAD_FACTOR * MAD of the durations, are not regressions
+MAD_FACTOR = 3
+TIME_FLOOR_S = 0.0002
+MEMORY_FLOOR_BYTES = 16384
+
+
+def ticker_payload(nb_symbols: int) -> bytes:
+    """*fixture of the Binance /api/v3/ticker/price response*"""
+    rng = np.random.default_rng(0)
+    symbols = ["BTCUSDC", "BNBUSDC", "EURIUSDC"] + [f"SYM{i}USDT" for i in range(nb_symbols - 3)]
+    return json.dumps([{"symbol": symbol, "price": f"{price:.8f}"}
+                       for symbol, price in zip(symbols, rng.uniform(0.01, 60000, nb_symbols))]).encode()
+
+
+def kline_payload(nb_klines: int) -> bytes:
+    """*fixture of the Binance /api/v3/klines response, 1h interval*"""
+    rng = np.random.default_rng(0)
+    close = 60000 * np.exp(np.cumsum(rng.normal(0, 0.005, nb_klines)))
+    volume = rng.uniform(10, 500, nb_klines)
+    taker_ratio = rng.uniform(0.1, 0.9, nb_klines)
+    open_time = 1735689600000 + 3600000 * np.arange(nb_klines)
+    klines = []
+    for i in range(nb_klines):
+        open_price = close[i - 1] if i else close[0]
+        klines.append([
+            int(open_time[i]), f"{open_price:.2f}", f"{max(open_price, close[i]) * 1.002:.2f}",
+            f"{min(open_price, close[i]) * 0.998:.2f}", f"{close[i]:.2f}", f"{volume[i]:.5f}",
+            int(open_time[i]) + 3599999, f"{volume[i] * close[i]:.5f}", int(volume[i] * 40),
+            f"{volume[i] * taker_ratio[i]:.5f}", f"{volume[i] * taker_ratio[i] * close[i]:.5f}", "0",
+        ])
+    return json.dumps(klines).encode()
+
+
+def weather_current_payload() -> bytes:
+    """*fixture of the weatherapi current.json response*"""
+    return json.dumps({
+        "location": {"name": "Paris", "region": "Ile-de-France", "country": "France", "lat": 48.87, "lon": 2.33,
+                     "tz_id": "Europe/Paris", "localtime_epoch": 1735732800, "localtime": "2025-01-01 13:00"},
+        "current": {"last_updated": "2025-01-01 13:00", "temp_c": 7.2, "is_day": 1,
+                    "condition": {"text": "Partly cloudy", "icon": "//cdn.weatherapi.com/116.png", "code": 1003},
+                    "wind_kph": 14.4, "wind_dir": "SW", "pressure_mb": 1018.0, "precip_mm": 0.1, "humidity": 81,
+                    "cloud": 75, "feelslike_c": 4.9, "uv": 1.0,
+                    "air_quality": {"co": 270.4, "no2": 21.8, "o3": 42.9, "so2": 3.1, "pm2_5": 8.3, "pm10": 11.2,
+                                    "us-epa-index": 1, "gb-defra-index": 1}},
+    }).encode()
+
+
+def weather_forecast_payload(days: int = 3) -> bytes:
+    """*fixture of the weatherapi forecast.json response, with hourly data*"""
+    current = json.loads(weather_current_payload())
+    forecastday = []
+    for d in range(days):
+        hours = [{"time": f"2025-01-0{d + 1} {h:02d}:00", "temp_c": 5 + h / 4, "condition": current["current"]["condition"],
+                  "wind_kph": 12.0, "precip_mm": 0.0, "humidity": 80, "cloud": 60, "feelslike_c": 3 + h / 4,
+                  "chance_of_rain": 10} for h in range(24)]
+        forecastday.append({"date": f"2025-01-0{d + 1}",
+                            "day": {"maxtemp_c": 9.1, "mintemp_c": 2.3, "avgtemp_c": 5.6, "totalprecip_mm": 1.2,
+                                    "avghumidity": 83, "condition": current["current"]["condition"]},
+                            "astro": {"sunrise": "08:44 AM", "sunset": "05:04 PM"},
+                            "hour": hours})
+    current["forecast"] = {"forecastday": forecastday}
+    current["alerts"] = {"alert": []}
+    return json.dumps(current).encode()
+
+
+def write_boursorama_export(data_path: str, nb_days: int) -> None:
+    """*fixture of the Boursorama "Télécharger les cotations" export, and of the dividend csv file*"""
+    rng = np.random.default_rng(0)
+    dates = np.busday_offset("2015-01-01", np.arange(nb_days), roll="forward")
+    close = 50 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, nb_days)))
+    with open(os.path.join(data_path, BENCH_STOCK + "_2025-01-01.txt"), "w") as f:
+        f.write("date\touv\thaut\tbas\tclot\tvol\tdevise\n")
+        for date, price in zip(dates.astype("O"), close):
+            f.write(f"{date:%d/%m/%Y} 00:00\t{price:.3f}\t{price * 1.01:.3f}\t{price * 0.99:.3f}\t{price:.3f}\t{rng.integers(1e4, 1e6)}\tEUR\n")
+    with open(os.path.join(data_path, BENCH_STOCK + "_dividende.csv"), "w") as f:
+        f.write("date,dividende\n")
+        for date in dates[250::250].astype("O"):
+            f.write(f"{date:%d/%m/%Y},1.20\n")
+
+
+def record_fixtures(fixtures_path: str = FIXTURES_PATH) -> None:
+    """*record the real responses of the APIs and a Boursorama export into the folder bench_fixtures*
+
+    The weather responses are recorded only if settings.py is available, and the export only if a .txt file
+    is found in the folder data. The API key is not part of the recorded responses.
+    """
+    os.makedirs(fixtures_path, exist_ok=True)
+    recorded = {"binance_ticker.json": crypto_caller.latest_price_Binance().get_response().content,
+                "binance_klines.json": crypto_caller.Binance_kline(limit=500).get_response().content}
+    try:
+        import settings
+        weather = API_caller.weather_API(settings.WEATHER_API_KEY, settings.WEATHER_CITY)
+        weather.get_current_weather()
+        recorded["weather_current.json"] = weather._response.content
+        weather.get_forecast()
+        recorded["weather_forecast.json"] = weather._response.content
+    except (ImportError, API_caller.API_caller_Exception, requests.RequestException) as e:
+        print(f"weather responses not recorded: {e}")
+    for file_name, content in recorded.items():
+        with open(os.path.join(fixtures_path, file_name), "wb") as f:
+            f.write(content)
+    try:
+        data_path = stock_analysis.get_data_path()
+        export = next(file_name for file_name in sorted(os.listdir(data_path)) if file_name.endswith(".txt"))
+        shutil.copyfile(os.path.join(data_path, export), os.path.join(fixtures_path, RECORDED_EXPORT))
+    except (FileNotFoundError, StopIteration):
+        print("Boursorama export not recorded: no .txt file found in the folder data")
+    print(f"fixtures recorded into {fixtures_path}: {sorted(os.listdir(fixtures_path))}")
+
+
+def recorded_fixtures() -> set[str]:
+    """*get the names of the recorded fixtures available in the folder bench_fixtures*"""
+    if not os.path.isdir(FIXTURES_PATH):
+        return set()
+    return set(os.listdir(FIXTURES_PATH)) & (set(RECORDED_ROUTES) | {RECORDED_EXPORT})
+
+
+class stub_handler(BaseHTTPRequestHandler):
+    """*serve the fixtures registered in server.routes, the query string is ignored*"""
+    def do_GET(self):
+        body = self.server.routes.get(self.path.split("?")[0])
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server() -> ThreadingHTTPServer:
+    """*start the local stub HTTP server with all the fixtures*"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), stub_handler)
+    server.routes = {"/weather/current.json": weather_current_payload(),
+                     "/weather/forecast.json": weather_forecast_payload()}
+    for size in TICKER_SIZES:
+        server.routes[f"/ticker/{size}"] = ticker_payload(size)
+    for size in KLINE_SIZES:
+        server.routes[f"/klines/{size}"] = kline_payload(size)
+    for file_name in recorded_fixtures() & set(RECORDED_ROUTES):
+        with open(os.path.join(FIXTURES_PATH, file_name), "rb") as f:
+            server.routes[RECORDED_ROUTES[file_name]] = f.read()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def build_benchmarks(url: str) -> list[tuple[str, object, int]]:
+    """*get the benchmarks as (name, function, number of items processed per call)*
+
+    The current path should contain the folder data with the Boursorama fixtures.
+    """
+    benchmarks = []
+    for size in TICKER_SIZES:
+        ticker = crypto_caller.latest_price_Binance()
+        ticker.base_url = f"{url}/ticker/{size}"
+        benchmarks.append((f"show_latest_price[{size}]", ticker.show_latest_price, size))
+    for size in KLINE_SIZES:
+        kline = crypto_caller.Binance_kline(limit=size)
+        kline.base_url = f"{url}/klines/{size}"
+        benchmarks.append((f"get_kline_data[{size}]", kline.get_kline_data, size))
+        # the signals are computed from the kline data fetched once
+        signals = crypto_caller.Binance_kline(limit=size)
+        signals.base_url = kline.base_url
+        signals.get_kline_data()
+        benchmarks.append((f"generate_signals[{size}]", signals.generate_signals, size))
+        scores = crypto_caller.Binance_kline(limit=size)
+        scores.base_url = kline.base_url
+        scores.generate_signals()
+        benchmarks.append((f"evaluate_signal_score[{size}]", scores.evaluate_signal_score, size))
+    weather = API_caller.weather_API("BENCH_KEY")
+    weather._url = f"{url}/weather/"
+    benchmarks.append(("get_current_weather", weather.get_current_weather, 1))
+    benchmarks.append(("get_forecast", weather.get_forecast, 3))
+    benchmarks.append((f"treat_price[{PRICE_SIZE}]", lambda: stock_analysis.treat_price(BENCH_STOCK), PRICE_SIZE))
+    stock_analysis.treat_price(BENCH_STOCK)
+    analyser = stock_analysis.stock_analyser(BENCH_STOCK)
+    start_date = analyser._stock_price.index[0]
+    benchmarks.append((f"stock_analyser[{PRICE_SIZE}]", lambda: stock_analysis.stock_analyser(BENCH_STOCK), PRICE_SIZE))
+    benchmarks.append((f"RoI[{PRICE_SIZE}]", lambda: analyser.RoI(start_date), PRICE_SIZE))
+    benchmarks.append((f"SD[{PRICE_SIZE}]", lambda: analyser.SD(start_date), PRICE_SIZE))
+    benchmarks += build_recorded_benchmarks(url)
+    return benchmarks
+
+
+def build_recorded_benchmarks(url: str) -> list[tuple[str, object, int]]:
+    """*get the benchmarks of the recorded fixtures available, named [recorded]*"""
+    benchmarks = []
+    recorded = recorded_fixtures()
+    if "binance_ticker.json" in recorded:
+        ticker = crypto_caller.latest_price_Binance()
+        ticker.base_url = f"{url}/recorded/ticker"
+        benchmarks.append(("show_latest_price[recorded]", ticker.show_latest_price, len(ticker.get_response().json())))
+    if "binance_klines.json" in recorded:
+        kline = crypto_caller.Binance_kline()
+        kline.base_url = f"{url}/recorded/klines"
+        kline.evaluate_signal_score()
+        size = len(kline._df)
+        benchmarks.append(("get_kline_data[recorded]", kline.get_kline_data, size))
+        benchmarks.append(("generate_signals[recorded]", kline.generate_signals, size))
+        benchmarks.append(("evaluate_signal_score[recorded]", kline.evaluate_signal_score, size))
+    if {"weather_current.json", "weather_forecast.json"} <= recorded:
+        weather = API_caller.weather_API("BENCH_KEY")
+        weather._url = f"{url}/recorded/weather/"
+        benchmarks.append(("get_current_weather[recorded]", weather.get_current_weather, 1))
+        benchmarks.append(("get_forecast[recorded]", weather.get_forecast, 3))
+    if RECORDED_EXPORT in recorded:
+        shutil.copyfile(os.path.join(FIXTURES_PATH, RECORDED_EXPORT), os.path.join("data", RECORDED_STOCK + "_recorded.txt"))
+        stock_analysis.treat_price(RECORDED_STOCK)
+        # RoI and SD need a dividend file, a null dividend does not change the results
+        first_date = stock_analysis.load_table(os.path.join("data", RECORDED_STOCK + "_price.csv"), stock_analysis.PRICE_COLUMNS).index[0]
+        with open(os.path.join("data", RECORDED_STOCK + "_dividende.csv"), "w") as f:
+            f.write(f"date,dividende\n{first_date:%d/%m/%Y},0.0\n")
+        analyser = stock_analysis.stock_analyser(RECORDED_STOCK)
+        size = len(analyser._stock_price)
+        start_date = analyser._stock_price.index[0]
+        benchmarks.append(("treat_price[recorded]", lambda: stock_analysis.treat_price(RECORDED_STOCK), size))
+        benchmarks.append(("RoI[recorded]", lambda: analyser.RoI(start_date), size))
+        benchmarks.append(("SD[recorded]", lambda: analyser.SD(start_date), size))
+    return benchmarks
+
+
+def calibrate(function) -> int:
+    """*warm up the function, then get the number of calls for a sample to last at least MIN_SAMPLE_S*"""
+    for _ in range(WARMUP_CALLS):
+        function()
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SAMPLE_S:
+            return loops
+        loops = max(2 * loops, int(loops * MIN_SAMPLE_S / max(elapsed, 1e-9)) + 1)
+
+
+def time_sample(function, loops: int) -> float:
+    """*get the mean duration per call over loops calls*"""
+    start = time.perf_counter()
+    for _ in range(loops):
+        function()
+    return (time.perf_counter() - start) / loops
+
+
+def peak_memory(function) -> int:
+    """*get the lowest peak memory of a call over PEAK_CALLS calls*
+
+    The peak memory is measured apart from the timing, since tracemalloc slows down the allocations.
+    """
+    peaks = []
+    tracemalloc.start()
+    for _ in range(PEAK_CALLS):
+        tracemalloc.reset_peak()
+        function()
+        peaks.append(tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+    return min(peaks)
+
+
+def measure(benchmarks: list[tuple[str, object, int]], repeat: int) -> dict[str, dict[str, float]]:
+    """*measure the duration per call and the peak memory of the benchmarks*
+
+    Each benchmark is warmed up, and its number of calls per sample is scaled so that a sample lasts at least
+    MIN_SAMPLE_S. The samples are taken in rounds over all the benchmarks, so that a slow period of the machine
+    does not affect all the samples of a benchmark. As timeit, the garbage collector does not run during the timing.
+    """
+    loops = [calibrate(function) for _, function, _ in benchmarks]
+    durations = [[] for _ in benchmarks]
+    gc.collect()
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            for i, (_, function, _) in enumerate(benchmarks):
+                durations[i].append(time_sample(function, loops[i]))
+    finally:
+        if gc_enabled:
+            gc.enable()
+    results = {}
+    for (name, function, items), samples in zip(benchmarks, durations):
+        median = statistics.median(samples)
+        results[name] = {"median_s": median, "min_s": min(samples),
+                         "mad_s": statistics.median(abs(sample - median) for sample in samples),
+                         "items_per_s": items / median, "peak_bytes": peak_memory(function)}
+    return results
+
+
+def run(repeat: int = 10) -> dict[str, dict[str, float]]:
+    """*run all the benchmarks in a temporary folder data, with the local stub server*"""
+    server = start_stub_server()
+    current_path = os.getcwd()
+    with tempfile.TemporaryDirectory() as temp_path:
+        os.mkdir(os.path.join(temp_path, "data"))
+        write_boursorama_export(os.path.join(temp_path, "data"), PRICE_SIZE)
+        os.chdir(temp_path)
+        try:
+            # the hot paths print some messages and warnings, which are not part of the benchmark
+            with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                benchmarks = build_benchmarks(f"http://127.0.0.1:{server.server_address[1]}")
+                results = measure(benchmarks, repeat)
+        finally:
+            os.chdir(current_path)
+            server.shutdown()
+    return results
+
+
+def machine_speed(results: dict, baseline: dict) -> float:
+    """*get the median ratio of the durations to the baseline, i.e. how much slower the machine is running*"""
+    ratios = [result["median_s"] / baseline[name]["median_s"] for name, result in results.items() if name in baseline]
+    return statistics.median(ratios) if ratios else 1.0
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """*get the list of regressions*
+
+    The median durations are compared after scaling the baseline by the machine speed, since the load of
+    the machine changes all the durations alike between two runs. The baseline is only scaled up: a machine
+    speed below 1 may come from optimizations, which should not turn the unchanged benchmarks into regressions.
+    A regression is a duration or a peak memory
+    above the baseline by more than the tolerance, which is the largest of baseline * threshold,
+    MAD_FACTOR * the MAD of the durations, and the noise floor TIME_FLOOR_S or MEMORY_FLOOR_BYTES.
+    """
+    speed = max(machine_speed(results, baseline), 1.0)
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]["median_s"] * speed
+        mad = max(baseline[name].get("mad_s", 0) * speed, result["mad_s"])
+        limit = expected + max(expected * threshold, MAD_FACTOR * mad, TIME_FLOOR_S)
+        if result["median_s"] > limit:
+            regressions.append(f"{name}: median_s {result['median_s']:.6g} > {limit:.6g} (baseline {baseline[name]['median_s']:.6g}, machine speed {speed:.2f})")
+        limit = baseline[name]["peak_bytes"] + max(baseline[name]["peak_bytes"] * threshold, MEMORY_FLOOR_BYTES)
+        if result["peak_bytes"] > limit:
+            regressions.append(f"{name}: peak_bytes {result['peak_bytes']} > {limit:.6g} (baseline {baseline[name]['peak_bytes']})")
+    return regressions
+
+
+def snapshot_views_sequence() -> None:
+    """*read a kline frame without copy, close the consumer and the producer, then use the frame*"""
+    # the refused close is logged as an error, and the refresh prints the signals, both are expected here
+    logging.disable(logging.ERROR)
+    sys.stdout = io.StringIO()
+    server = start_stub_server()
+    kline = crypto_caller.Binance_kline(symbol="CHECK", limit=KLINE_SIZES[0])
+    kline.base_url = f"http://127.0.0.1:{server.server_address[1]}/klines/{KLINE_SIZES[0]}"
+    producer = shared_snapshot.snapshot_producer(f"hinfo_check_{os.getpid()}", klines=[kline])
+    try:
+        producer.refresh()
+        consumer = shared_snapshot.snapshot_consumer(f"hinfo_check_{os.getpid()}")
+        expected = consumer.kline_frame("CHECK").sum()
+        frame = consumer.kline_frame("CHECK", copy=False)
+        try:
+            consumer.close()
+            raise AssertionError("the consumer has been closed while a view is referenced")
+        except shared_snapshot_Exception:
+            pass
+    finally:
+        producer.close()
+        server.shutdown()
+    # the view should still be mapped, reading an unmapped view crashes the process
+    assert frame.sum().equals(expected)
+    del frame
+    consumer.close()
+
+
+def check_snapshot_views() -> bool:
+    """*check in a separated process that closing the snapshots does not unmap the views still referenced*"""
+    process = multiprocessing.get_context("spawn").Process(target=snapshot_views_sequence)
+    process.start()
+    process.join()
+    return process.exitcode == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark of the hot paths of HinfoHub")
+    parser.add_argument("--record", action="store_true", help="record the real responses into bench_fixtures, then exit")
+    parser.add_argument("--repeat", type=int, default=10, help="number of timed samples per benchmark")
+    parser.add_argument("--save", help="save the results as baseline into this json file")
+    parser.add_argument("--compare", help="compare the results to the baseline stored in this json file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="relative regression allowed, 0.25 for 25%%")
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixtures()
+        return
+    if not check_snapshot_views():
+        print("CHECK FAILED shared snapshot views")
+        sys.exit(1)
+    results = run(args.repeat)
+    print(f"{'benchmark':<32}{'median (ms)':>14}{'min (ms)':>14}{'items/s':>14}{'peak (KiB)':>14}")
+    for name, result in results.items():
+        print(f"{name:<32}{result['median_s'] * 1e3:>14.3f}{result['min_s'] * 1e3:>14.3f}{result['items_per_s']:>14.0f}{result['peak_bytes'] / 1024:>14.1f}")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        print(f"machine speed compared to the baseline: {machine_speed(results, baseline):.2f}")
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
+
+# End of file
@@ -13,15 +13,21 @@
 
 # import private packages
 import API_caller
+import instrumentation
 
 # import settings
 import settings
 
 def main():
+    if getattr(settings, "INSTRUMENTATION", False):
+        instrumentation.enable()
     if settings.WEATHER:
         weather = API_caller.weather_API(settings.WEATHER_API_KEY, settings.WEATHER_CITY)
         weather.show_current_weather_information()
         # weather.show_forecast_information(days=5)
+    if instrumentation.is_enabled():
+        # printed, as the logging level of the settings is usually above INFO
+        print(instrumentation.export_prometheus())
 
 
 if __name__ == "__main__":
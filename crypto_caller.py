@@ -20,6 +20,7 @@ import requests
 # import private packages
 from exception import API_caller_Exception
 import API_caller
+import instrumentation
 
 
 class latest_price_Binance():
@@ -39,7 +40,9 @@ class latest_price_Binance():
             the response from the API
         """
         self._timestamp = datetime.utcnow().isoformat()
-        self._response = requests.get(self.base_url+url_modifier)
+        url = self.base_url+url_modifier
+        with instrumentation.http_call(url) as call:
+            self._response = call.record(requests.get(url))
         # check the status code
         if self._response.status_code != 200:
             # !! TODO: clarify according to the error code and / or message
@@ -58,7 +61,8 @@ class latest_price_Binance():
             the latest price of the crypto currencies
         """
         response = self.get_response()
-        data = response.json()
+        with instrumentation.span("json_parse", source="binance_ticker"):
+            data = response.json()
         prices = {item['symbol']: item['price'] for item in data if item['symbol'] in self._symbols}
         return prices
     
@@ -79,13 +83,120 @@ class latest_price_Binance():
             logging.info(f"{symbol}: {price} USDC")
             print(f"{symbol}: {price} USDC")
 
+KLINE_FIELDS = ['open_time', 'open_price', 'high_price', 'low_price', 'close_price', 'volume', 'close_time', 'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume']
+INDICATOR_FIELDS = ['volume_weighted_average_price', 'buy_pressure', 'net_quote_flow', 'flow_momentum', 'ma_20', 'volatility', 'price_momentum']
+SIGNAL_FIELDS = ['buy_pressure_upper', 'buy_pressure_lower', 'net_quote_flow_upper', 'net_quote_flow_lower', 'flow_momentum_upper', 'flow_momentum_lower', 'VWAP_upper', 'VWAP_lower', 'price_momentum_upper', 'price_momentum_lower', 'low_volatility', 'volatility_spike']
+SCORE_FIELDS = ['positive_score', 'negative_score', 'final_signal']
+FINAL_SIGNAL_CODES = {'negative': -1, 'neutral': 0, 'positive': 1}
+
+
+class kline_ring_buffer():
+    """*kline_ring_buffer class*
+
+    Fixed-capacity ring buffer of records, used to hold the candles, indicators, flags and scores of a symbol.
+    All the fields are float64 and the first field is the time (in ms), so that the structured record array
+    can also be seen as a 2D array. Each record is written twice, at positions i and i + capacity, hence the
+    current window is always a contiguous slice and can be exposed as a DataFrame without copying.
+    The memory is allocated once: 2 * capacity * number of fields * 8 bytes.
+    """
+    def __init__(self, capacity: int, fields: list[str]):
+        """*Initialize the kline_ring_buffer class*"""
+        if capacity <= 0:
+            raise ValueError(f"capacity should be positive, not {capacity}")
+        self._capacity = capacity
+        self._fields = list(fields)
+        self._records = np.full(2 * capacity, np.nan, dtype=np.dtype([(field, np.float64) for field in self._fields]))
+        self._values = self._records.view(np.float64).reshape(2 * capacity, len(self._fields))
+        self._start = 0  # position of the oldest record
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __str__(self) -> str:
+        return f"kline_ring_buffer(capacity={self._capacity}, size={self._size}, nbytes={self.nbytes})"
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def nbytes(self) -> int:
+        return self._records.nbytes
+
+    def records(self) -> np.ndarray:
+        """*get the current window as a structured record array, without copying*"""
+        return self._records[self._start:self._start + self._size]
+
+    def window(self) -> np.ndarray:
+        """*get the current window as a 2D float array (records x fields), without copying*"""
+        return self._values[self._start:self._start + self._size]
+
+    def _write(self, positions: np.ndarray, columns, values) -> None:
+        """*write the values at the positions of the window, in both copies of the records*"""
+        physical = self._start + positions
+        self._values[physical, columns] = values
+        self._values[(physical + self._capacity) % (2 * self._capacity), columns] = values
+
+    def update(self, values: np.ndarray) -> None:
+        """*store new records, sorted by time*
+
+        values is a 2D array holding the first values.shape[1] fields. The records whose time is already stored
+        (e.g. the live candle) are overwritten in place, the newer ones overwrite the oldest records.
+        The other fields of the new records are set to NaN.
+        """
+        n_columns = values.shape[1]
+        if self._size:
+            window = self.window()
+            positions = np.searchsorted(window[:, 0], values[:, 0])
+            stored = (positions < self._size) & (window[np.minimum(positions, self._size - 1), 0] == values[:, 0])
+            self._write(positions[stored], slice(0, n_columns), values[stored])
+            values = values[values[:, 0] > window[-1, 0]]
+        values = values[-self._capacity:]
+        records = np.full((len(values), len(self._fields)), np.nan)
+        records[:, :n_columns] = values
+        physical = (self._start + self._size + np.arange(len(values))) % self._capacity
+        self._values[physical] = records
+        self._values[physical + self._capacity] = records
+        overflow = max(self._size + len(values) - self._capacity, 0)
+        self._start = (self._start + overflow) % self._capacity
+        self._size = min(self._size + len(values), self._capacity)
+
+    def set_columns(self, columns) -> None:
+        """*overwrite whole fields of the current window*
+
+        parameters:
+            columns: a dict or a DataFrame of field name -> values of the length of the window
+        """
+        positions = np.arange(self._size)
+        for field in columns:
+            self._write(positions, self._fields.index(field), np.asarray(columns[field], dtype=np.float64))
+
+    def frame(self, fields: list[str]) -> pd.DataFrame:
+        """*get the current window as a DataFrame indexed by the time, without copying the values*
+
+        The fields should be consecutive in the buffer. The DataFrame is a view for internal use: its index is
+        fixed, so it is invalidated by the next update (the rows may then hold other records).
+        """
+        first = self._fields.index(fields[0])
+        if self._fields[first:first + len(fields)] != list(fields):
+            raise ValueError(f"fields {fields} are not consecutive in the buffer")
+        window = self.window()
+        index = pd.to_datetime(window[:, 0], unit='ms')
+        index.name = self._fields[0]
+        return pd.DataFrame(window[:, first:first + len(fields)], index=index, columns=fields, copy=False)
+
+
 class Binance_kline():
     """*Binance_kline class*
     
     This class is used to get the kline data from the Binance API.
     It is now being implemented.
+    The candles, indicators, flags and scores are held in a kline_ring_buffer of fixed capacity (limit by default),
+    and _df, _df_signals and _signal_score are views of its current window. The public methods return copies
+    by default, window_frame and copy=False give the views, which are invalidated by the next refresh.
     """
-    def __init__(self, symbol: str = "BTCUSDC", interval: str = "1h", limit: int = 500, start_time: str = None, end_time: str = None):
+    def __init__(self, symbol: str = "BTCUSDC", interval: str = "1h", limit: int = 500, start_time: str = None, end_time: str = None, capacity: int = None):
         """*Initialize the Binance_kline class*"""
         self.base_url = "https://api.binance.com/api/v3/klines"
         self._symbol = symbol
@@ -94,6 +205,7 @@ class Binance_kline():
         self._start_time = start_time
         self._end_time = end_time
         self._response = None
+        self._buffer = kline_ring_buffer(capacity or limit, KLINE_FIELDS + INDICATOR_FIELDS + SIGNAL_FIELDS + SCORE_FIELDS)
         self._df = None
         self._df_signals = None
         self._signal_score = None
@@ -116,7 +228,9 @@ class Binance_kline():
             'endTime': self._end_time
         }
         self._timestamp = datetime.utcnow().isoformat()
-        self._response = requests.get(self.base_url + url_modifier, params=params)
+        url = self.base_url + url_modifier
+        with instrumentation.http_call(url) as call:
+            self._response = call.record(requests.get(url, params=params))
         # check the status code
         if self._response.status_code != 200:
             logging.error(f"Error: {self._response.status_code}")
@@ -125,41 +239,53 @@ class Binance_kline():
         logging.info(f"response status code: {self._response.status_code}")
         return self._response
 
-    def get_kline_data(self) -> pd.DataFrame:
+    def window_frame(self, fields: list[str] = KLINE_FIELDS[1:] + INDICATOR_FIELDS + SIGNAL_FIELDS + SCORE_FIELDS) -> pd.DataFrame:
+        """*get consecutive fields of the current window as a DataFrame indexed by open_time, without copying*
+
+        The DataFrame is a view of the buffer: it is invalidated by the next refresh (get_kline_data),
+        its rows may then hold other candles. Copy it to keep it longer.
+        """
+        return self._buffer.frame(fields)
+
+    def get_kline_data(self, copy: bool = True) -> pd.DataFrame:
         """*get the kline data from the Binance API*
 
+        parameters:
+            copy: True to get a copy which is not modified by the next refresh, False to get a view of the buffer
         output:
-            the kline data from the Binance API
+            the kline data and the indicators of the window of the buffer
         """
         response = self.get_response()
-        data = response.json()
+        with instrumentation.span("json_parse", source="binance_kline"):
+            data = response.json()
         if not data:
             raise API_caller_Exception("No kline data found for the specified parameters.")
-        # Convert the data to a pandas DataFrame
-        columns = ['open_time', 'open_price', 'high_price', 'low_price', 'close_price', 'volume', 'close_time', 'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore']
-        df = pd.DataFrame(data, columns=columns)
-        # drop the 'ignore' column as it is not needed
-        df.drop(columns=['ignore'], inplace=True)
-        # Convert timestamps to datetime
-        df['open_time'] = pd.to_datetime(df['open_time'], unit='ms')
-        df['close_time'] = pd.to_datetime(df['close_time'], unit='ms')
-        # Convert numeric columns to float
-        numeric_columns = ['open_price', 'high_price', 'low_price', 'close_price', 'volume', 'quote_asset_volume', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume']
-        df[numeric_columns] = df[numeric_columns].astype(float)
-        # Set the open_time as the index
-        df.set_index('open_time', inplace=True)
-        # Calculate additional columns : 'volume_weighted_average_price', 'buy_pressure', 'net_quote_flow', 'flow_momentum', 'ma_20', 'volatility', 'price_momentum'
-        df['volume_weighted_average_price'] = np.where(df['volume'] != 0, df['quote_asset_volume'] / df['volume'], 0)
-        df['buy_pressure'] = df['taker_buy_base_asset_volume'] / df['volume']
-        df['net_quote_flow'] = 2 * df['taker_buy_quote_asset_volume'] - df['quote_asset_volume']
-        df['flow_momentum'] = df['net_quote_flow'].diff().fillna(0)
-        df['ma_20'] = df['volume_weighted_average_price'].rolling(window=20).mean()
-        df['volatility'] = df['volume_weighted_average_price'].rolling(window=20).std()
-        df['price_momentum'] = df['close_price'].diff().rolling(3).sum()
-        self._df = df  # Store the DataFrame for later use
+        with instrumentation.span("kline_indicators"):
+            # Convert the data to float, timestamps in ms, and drop the 'ignore' column as it is not needed
+            klines = np.array([kline[:len(KLINE_FIELDS)] for kline in data], dtype=np.float64)
+            # Store the candles, the candles already in the buffer (e.g. the live one) are overwritten in place
+            self._buffer.update(klines)
+            df = self._buffer.frame(KLINE_FIELDS[1:])
+            # Calculate additional columns over the whole window : 'volume_weighted_average_price', 'buy_pressure', 'net_quote_flow', 'flow_momentum', 'ma_20', 'volatility', 'price_momentum'
+            # they are written into the buffer from a dict of columns, without building a DataFrame
+            indicators = {}
+            indicators['volume_weighted_average_price'] = pd.Series(np.where(df['volume'] != 0, df['quote_asset_volume'] / df['volume'], 0), index=df.index)
+            indicators['buy_pressure'] = df['taker_buy_base_asset_volume'] / df['volume']
+            indicators['net_quote_flow'] = 2 * df['taker_buy_quote_asset_volume'] - df['quote_asset_volume']
+            indicators['flow_momentum'] = indicators['net_quote_flow'].diff().fillna(0)
+            indicators['ma_20'] = indicators['volume_weighted_average_price'].rolling(window=20).mean()
+            indicators['volatility'] = indicators['volume_weighted_average_price'].rolling(window=20).std()
+            indicators['price_momentum'] = df['close_price'].diff().rolling(3).sum()
+            self._buffer.set_columns(indicators)
+        # Store the view of the window for later use, the signals are to be generated again
+        self._df = self._buffer.frame(KLINE_FIELDS[1:] + INDICATOR_FIELDS)
+        self._df_signals = None
+        self._signal_score = None
         logging.info(f"Kline data for {self._symbol} at time {self._timestamp}:")
-        logging.debug(df.head())
-        return df
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(self._df.head())
+        # by default a copy, since the view is invalidated by the next update of the buffer
+        return self._df.copy() if copy else self._df
 
     def plot_kline_data(self) -> bool:
         """*Plot the kline data from the Binance API*
@@ -172,7 +298,8 @@ class Binance_kline():
             df = self.get_kline_data()
             logging.info(f"Kline data for {self._symbol} at time {self._timestamp}:")
             print(f"Kline data for {self._symbol} at time {self._timestamp}:")
-            logging.debug(df.head())
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug(df.head())
             # Plot the kline data
             fig1 = plt.figure(figsize=(12, 6))
             ax1 = fig1.add_subplot(231)
@@ -211,18 +338,21 @@ class Binance_kline():
             logging.error(f"Error showing kline data: {e}")
             return False
 
-    def generate_signals(self) -> pd.DataFrame:
+    @instrumentation.timed("signal_generation")
+    def generate_signals(self, copy: bool = True) -> pd.DataFrame:
         """*Generate trading signals based on the kline data*
 
         This method generates trading signals based on the kline data.
         It is a placeholder for now and will be implemented later.
+        parameters:
+            copy: True to get a copy which is not modified by the next refresh, False to get a view of the buffer
         output:
-            a dictionary with the trading signals
+            a DataFrame with the trading signals, 1 if the flag is raised, 0 otherwise
         """
         # If the _df is not yet generated
         if self._df is None:
             self.get_response()
-            self.get_kline_data()
+            self.get_kline_data(copy=False)
         # Generate trading signals based on the kline data
         buy_pressure_upper_flag = self._df['buy_pressure'] > 0.7
         buy_pressure_lower_flag = self._df['buy_pressure'] < 0.3
@@ -237,8 +367,8 @@ class Binance_kline():
         low_volatility_flag = self._df['volatility'] < 0.8 * self._df['volatility'].rolling(window=60).mean()
         rolling_window = 48  # 48 hours for 1-hour intervals, 2 days
         volatility_spike_flag = self._df['volatility'] > (self._df['volatility'].rolling(window=rolling_window).mean() + 2 * self._df['volatility'].rolling(window=rolling_window).std())
-        # Create a DataFrame to hold the signals
-        df_signals = pd.DataFrame(index=self._df.index)
+        # Create a dict of columns to hold the signals
+        df_signals = {}
         df_signals['buy_pressure_upper'] = buy_pressure_upper_flag
         df_signals['buy_pressure_lower'] = buy_pressure_lower_flag
         df_signals['net_quote_flow_upper'] = net_quote_flow_upper_flag
@@ -251,34 +381,42 @@ class Binance_kline():
         df_signals['price_momentum_lower'] = price_momentum_lower_flag
         df_signals['low_volatility'] = low_volatility_flag
         df_signals['volatility_spike'] = volatility_spike_flag
+        # Store the flags as 0 / 1 in the buffer
+        self._buffer.set_columns(df_signals)
+        df_signals = self._buffer.frame(SIGNAL_FIELDS)
         self._df_signals = df_signals
         # Log the signals
         logging.info(f"Trading signals for {self._symbol} at time {self._timestamp}:")
-        logging.debug(df_signals.head())
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(df_signals.head())
         print(f"Trading signals for {self._symbol} at time {self._timestamp}:")
-        return df_signals
+        return df_signals.copy() if copy else df_signals
 
-    def evaluate_signal_score(self, strategy_name: str = "default") -> pd.DataFrame:
+    @instrumentation.timed("signal_scoring")
+    def evaluate_signal_score(self, strategy_name: str = "default", copy: bool = True) -> pd.DataFrame:
         """*Evaluate the signal score based on the trading signals*
 
         This method evaluates the signal score based on the trading signals.
         It is a placeholder for now and will be implemented later.
+        parameters:
+            strategy_name: the name of the strategy
+            copy: True to get a copy which is not modified by the next refresh, False to get a view of the buffer
         output:
-            a DataFrame with the signal scores
+            a DataFrame with the signal scores, the final signal is coded by FINAL_SIGNAL_CODES
         """
         if self._df_signals is None:
-            self.generate_signals()
-        # self._signal_score has two columns: 'positive_score' and 'negative_score'
-        self._signal_score = pd.DataFrame(index=self._df_signals.index)
+            self.generate_signals(copy=False)
+        # signal_score has two columns: 'positive_score' and 'negative_score'
+        signal_score = {}
         if strategy_name in ["default", "st1"]:
-            self._signal_score['positive_score'] = (
+            signal_score['positive_score'] = (
                 self._df_signals['buy_pressure_upper'].astype(int) +
                 self._df_signals['net_quote_flow_upper'].astype(int) +
                 self._df_signals['flow_momentum_upper'].astype(int) +
                 self._df_signals['VWAP_upper'].astype(int) +
                 self._df_signals['low_volatility'].astype(int)
             )
-            self._signal_score['negative_score'] = (
+            signal_score['negative_score'] = (
                 self._df_signals['buy_pressure_lower'].astype(int) +
                 self._df_signals['net_quote_flow_lower'].astype(int) +
                 self._df_signals['flow_momentum_lower'].astype(int) +
@@ -286,23 +424,25 @@ class Binance_kline():
                 self._df_signals['low_volatility'].astype(int)
             )
             # Normalize the scores to be between 0 and 1
-            self._signal_score['positive_score'] = self._signal_score['positive_score'] / 5
-            self._signal_score['negative_score'] = self._signal_score['negative_score'] / 5
+            signal_score['positive_score'] = signal_score['positive_score'] / 5
+            signal_score['negative_score'] = signal_score['negative_score'] / 5
         else:
             raise API_caller_Exception(f"Strategy {strategy_name} is not implemented.")
 
-        # Evaluate a final score
-        def classify_signal(row, threshold=0.5):
-            if row['positive_score'] > threshold and row['negative_score'] < threshold:
-                return 'positive'
-            elif row['negative_score'] > threshold and row['positive_score'] < threshold:
-                return 'negative'
-            else:
-                return 'neutral'
-        self._signal_score['final_signal'] = self._signal_score.apply(classify_signal, axis=1)
+        # Evaluate a final score, coded by FINAL_SIGNAL_CODES
+        threshold = 0.5
+        signal_score['final_signal'] = np.select(
+            [(signal_score['positive_score'] > threshold) & (signal_score['negative_score'] < threshold),
+             (signal_score['negative_score'] > threshold) & (signal_score['positive_score'] < threshold)],
+            [FINAL_SIGNAL_CODES['positive'], FINAL_SIGNAL_CODES['negative']],
+            default=FINAL_SIGNAL_CODES['neutral'])
+        # Store the scores in the buffer
+        self._buffer.set_columns(signal_score)
+        self._signal_score = self._buffer.frame(SCORE_FIELDS)
         logging.info(f"Signal scores for {self._symbol} at time {self._timestamp}:")
-        logging.debug(self._signal_score.head())
-        return self._signal_score
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(self._signal_score.head())
+        return self._signal_score.copy() if copy else self._signal_score
 
     def plot_price_with_signal_score(self):
         """*Plot the price with the signal score*
@@ -311,9 +451,9 @@ class Binance_kline():
         It is a placeholder for now and will be implemented later.
         """
         if self._df is None:
-            self.get_kline_data()
+            self.get_kline_data(copy=False)
         if self._signal_score is None:
-            self.evaluate_signal_score()
+            self.evaluate_signal_score(copy=False)
         
         fig, ax1 = plt.subplots(figsize=(12, 6))
         fig.suptitle(f"Price and Signal Scores for {self._symbol}", fontsize=16)
@@ -339,9 +479,9 @@ class Binance_kline():
         lines_2, labels_2 = ax2.get_legend_handles_labels()
 
         for idx, row in self._signal_score.iterrows():
-            if row['final_signal'] == 'positive':
+            if row['final_signal'] == FINAL_SIGNAL_CODES['positive']:
                 ax1.axvline(idx, color='green', alpha=0.1)
-            elif row['final_signal'] == 'negative':
+            elif row['final_signal'] == FINAL_SIGNAL_CODES['negative']:
                 ax1.axvline(idx, color='red', alpha=0.1)
 
         plt.tight_layout()
@@ -20,4 +20,8 @@ class crypto_API_key_Exception(crypto_API_Exception):
     "raise this exception when the crypto API key is not valid"
     pass
 
+class shared_snapshot_Exception(Exception):
+    "raise this exception when a consistent shared snapshot cannot be read"
+    pass
+
 # End of file
\ No newline at end of file
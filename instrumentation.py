@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+""" instrumentation
+    opyright (C) 2025 Hao HUANG
+    Resume of file :
+        In this file, we define a lightweight instrumentation layer for the hot paths:
+        timing spans (HTTP calls, JSON parse, indicators, signal scoring, stock analytics),
+        observed values (time to first byte, body size) and counters (cache hits, HTTP errors).
+        The metrics can be exported as JSON or as Prometheus text format.
+        The instrumentation is disabled by default, and then costs a single flag check per call.
+"""
+############################################################################
+
+# import public packages
+import json
+import time
+import threading
+import functools
+
+# import third-party packages
+
+# import private packages
+
+
+PREFIX = "hinfo_"
+
+_enabled = False
+_lock = threading.Lock()
+# (name, labels) -> [count, sum, min, max]
+_summaries: dict[tuple[str, tuple], list[float]] = {}
+# (name, labels) -> value
+_counters: dict[tuple[str, tuple], float] = {}
+
+
+def enable() -> None:
+    """*enable the collection of the metrics*"""
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    """*disable the collection of the metrics, the collected metrics are kept*"""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    """*drop all the collected metrics*"""
+    with _lock:
+        _summaries.clear()
+        _counters.clear()
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """*record an observed value, e.g. a duration or a size*
+
+    The count, sum, minimum and maximum of the values are kept for each name and labels.
+    """
+    if not _enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        summary = _summaries.get(key)
+        if summary is None:
+            _summaries[key] = [1, value, value, value]
+        else:
+            summary[0] += 1
+            summary[1] += value
+            summary[2] = min(summary[2], value)
+            summary[3] = max(summary[3], value)
+
+
+def count(name: str, value: float = 1, **labels) -> None:
+    """*increase a counter, e.g. cache hits or errors*"""
+    if not _enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+class _span:
+    """*timing span, record the elapsed time in seconds under name_seconds*"""
+    __slots__ = ("_name", "_labels", "_start")
+
+    def __init__(self, name: str, labels: dict):
+        self._name = name
+        self._labels = labels
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        observe(self._name + "_seconds", time.perf_counter() - self._start, **self._labels)
+        return False
+
+
+class _null_span:
+    """*span used when the instrumentation is disabled, do nothing*"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        return False
+
+
+_NULL_SPAN = _null_span()
+
+
+def span(name: str, **labels):
+    """*get a timing span to be used in a with statement*
+
+    example:
+        with instrumentation.span("json_parse", source="binance_ticker"):
+            data = response.json()
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _span(name, labels)
+
+
+def timed(name: str):
+    """*decorator timing each call of the function as a span*"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _span(name, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_response(response, **labels) -> None:
+    """*record the time to first byte and the body size of a requests.Response*
+
+    requests does not expose the DNS and connect durations, they are included in the time to first byte.
+    """
+    if not _enabled:
+        return
+    observe("http_ttfb_seconds", response.elapsed.total_seconds(), **labels)
+    observe("http_body_bytes", len(response.content), **labels)
+    count("http_responses_total", status=str(response.status_code), **labels)
+
+
+class _http_call:
+    """*span of an HTTP call, record the response and count the errors*"""
+    __slots__ = ("_endpoint", "_start", "_response")
+
+    def __init__(self, endpoint: str):
+        self._endpoint = endpoint
+        self._response = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def record(self, response):
+        """*register the response of the call, and return it*"""
+        self._response = response
+        return response
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        observe("http_request_seconds", time.perf_counter() - self._start, endpoint=self._endpoint)
+        if exc_type is not None:
+            # connection errors, timeouts, ...
+            count("http_errors_total", endpoint=self._endpoint, reason=exc_type.__name__)
+        elif self._response is not None:
+            record_response(self._response, endpoint=self._endpoint)
+            if self._response.status_code != 200:
+                count("http_errors_total", endpoint=self._endpoint, reason=str(self._response.status_code))
+        return False
+
+
+class _null_http_call(_null_span):
+    """*HTTP call span used when the instrumentation is disabled, do nothing*"""
+    __slots__ = ()
+
+    def record(self, response):
+        return response
+
+
+_NULL_HTTP_CALL = _null_http_call()
+
+
+def http_call(endpoint: str):
+    """*get the span of an HTTP call to be used in a with statement*
+
+    The duration, the time to first byte, the body size and the status are recorded, and the errors
+    (exceptions raised in the with statement or status other than 200) are counted in http_errors_total.
+    example:
+        with instrumentation.http_call(url) as call:
+            response = call.record(requests.get(url))
+    """
+    if not _enabled:
+        return _NULL_HTTP_CALL
+    return _http_call(endpoint)
+
+
+def export_json() -> str:
+    """*export the collected metrics as a JSON string*"""
+    with _lock:
+        summaries = [{"name": name, "labels": dict(labels), "count": s[0], "sum": s[1], "min": s[2], "max": s[3]}
+                     for (name, labels), s in _summaries.items()]
+        counters = [{"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in _counters.items()]
+    return json.dumps({"summaries": summaries, "counters": counters})
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = {key: str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for key, value in labels}
+    return "{" + ",".join(f"{key}=\"{value}\"" for key, value in escaped.items()) + "}"
+
+
+def export_prometheus() -> str:
+    """*export the collected metrics in the Prometheus text format*
+
+    The observed values are exported as summaries (_count and _sum), the counters as counters.
+    """
+    lines = []
+    with _lock:
+        summaries = sorted(_summaries.items())
+        counters = sorted(_counters.items())
+    last_name = None
+    for (name, labels), s in summaries:
+        if name != last_name:
+            lines.append(f"# TYPE {PREFIX}{name} summary")
+            last_name = name
+        lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {s[0]}")
+        lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {s[1]}")
+    for (name, labels), value in counters:
+        if name != last_name:
+            lines.append(f"# TYPE {PREFIX}{name} counter")
+            last_name = name
+        lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+# End of file
@@ -20,6 +20,10 @@ import logging
 logger = logging.getLogger("Hinfo")
 logging.basicConfig(filename="./Hinfo.log", level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# instrumentation settings
+# collect timing spans and counters of the hot paths, see instrumentation.py
+INSTRUMENTATION = False
+
 # API settings
 
 # weather API
@@ -0,0 +1,374 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+""" shared_snapshot
+    opyright (C) 2025 Hao HUANG
+    Resume of file :
+        In this file, we define the shared-memory snapshot cache, so that a single producer process talks to
+        the upstream APIs (Binance latest prices and klines, weatherapi) and several consumer processes
+        (dashboard, signal evaluator, alerting, ...) read the latest snapshots without any request.
+        Each snapshot is a numpy array in multiprocessing.shared_memory, with two slots and a seqlock:
+        the producer writes into the inactive slot, then publishes it by increasing the version.
+        The consumers read the active slot without lock and without copying, and check its sequence number.
+"""
+############################################################################
+
+# import public packages
+import json
+import time
+import logging
+from multiprocessing import shared_memory, resource_tracker
+
+# import third-party packages
+import numpy as np
+import pandas as pd
+import requests
+
+# import private packages
+from exception import API_caller_Exception, shared_snapshot_Exception
+import crypto_caller
+
+
+# header of a snapshot buffer: version, sequence of slot 0 and 1, length of slot 0 and 1, capacity
+HEADER_SIZE = 6
+HEADER_NBYTES = HEADER_SIZE * np.dtype(np.int64).itemsize
+PRICE_DTYPE = np.dtype([("symbol", "S20"), ("price", np.float64)])
+KLINE_DTYPE = np.dtype([(field, np.float64) for field in crypto_caller.KLINE_FIELDS + crypto_caller.INDICATOR_FIELDS + crypto_caller.SIGNAL_FIELDS + crypto_caller.SCORE_FIELDS])
+JSON_DTYPE = np.dtype(np.uint8)
+
+
+class snapshot_buffer():
+    """*snapshot_buffer class*
+
+    Array of at most capacity records of dtype, stored twice (two slots) in a named shared memory.
+    Only the producer (create=True) publishes, any number of consumers read.
+    A published slot is not modified until the next-but-one publication, so a zero-copy read stays valid
+    at least one publication period; is_valid tells whether it has been overwritten since.
+    """
+    def __init__(self, name: str, dtype: np.dtype, capacity: int = 0, create: bool = False):
+        """*Initialize the snapshot_buffer class*
+
+        parameters:
+            name: the name of the shared memory
+            dtype: the dtype of the records
+            capacity: the maximum number of records, only needed by the producer
+            create: True for the producer, which creates the shared memory, False for the consumers
+        """
+        self._name = name
+        self._dtype = np.dtype(dtype)
+        self._create = create
+        if create:
+            self._shm = create_shared_memory(name, HEADER_NBYTES + 2 * capacity * self._dtype.itemsize, capacity)
+        else:
+            self._shm = attach_shared_memory(name)
+        self._map()
+        if self._capacity == 0:
+            # the producer has created the shared memory, but not initialized it yet
+            self._header = None
+            self._slots = None
+            self._shm.close()
+            raise shared_snapshot_Exception(f"{name} is not initialized by the producer yet.")
+        logging.debug(f"snapshot_buffer object created: {self}")
+
+    def _map(self) -> None:
+        # np.frombuffer keeps the mapping of the shared memory exported while the arrays (and their views) are alive:
+        # SharedMemory.close raises BufferError instead of unmapping it under a view. The mapping is used directly,
+        # since SharedMemory.close releases SharedMemory.buf before failing.
+        self._header = np.frombuffer(self._shm._mmap, dtype=np.int64, count=HEADER_SIZE)
+        self._capacity = int(self._header[5])
+        slots = np.frombuffer(self._shm._mmap, dtype=self._dtype, count=2 * self._capacity, offset=HEADER_NBYTES)
+        self._slots = [slots[:self._capacity], slots[self._capacity:]]
+
+    def __str__(self) -> str:
+        return f"snapshot_buffer(name={self._name}, dtype={self._dtype}, capacity={self._capacity}, create={self._create})"
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def version(self) -> int:
+        """*get the version of the latest snapshot, 0 if nothing has been published yet*"""
+        return int(self._header[0])
+
+    def publish(self, values: np.ndarray) -> int:
+        """*publish a new snapshot, only the last capacity records are kept*
+
+        output:
+            the version of the new snapshot
+        """
+        if not self._create:
+            raise shared_snapshot_Exception(f"{self._name} is opened by a consumer, it cannot be published.")
+        values = np.asarray(values, dtype=self._dtype)
+        values = values[max(len(values) - self._capacity, 0):]
+        version = int(self._header[0]) + 1
+        slot = version % 2
+        # an odd sequence number tells the consumers that the slot is being written
+        self._header[1 + slot] += 1
+        self._slots[slot][:len(values)] = values
+        self._header[3 + slot] = len(values)
+        self._header[1 + slot] += 1
+        self._header[0] = version
+        return version
+
+    def read(self, copy: bool = False, retries: int = 1000) -> tuple[np.ndarray, int]:
+        """*read the latest snapshot*
+
+        parameters:
+            copy: False to get a view of the shared memory, True to get a private copy
+            retries: the number of attempts before giving up, when the producer keeps writing
+        output:
+            the records and the version of the snapshot
+        """
+        for _ in range(retries):
+            version = int(self._header[0])
+            slot = version % 2
+            sequence = int(self._header[1 + slot])
+            if sequence % 2 == 0:
+                values = self._slots[slot][:int(self._header[3 + slot])]
+                if copy:
+                    values = values.copy()
+                # the version is checked again, since the slot may have been published twice in between
+                if int(self._header[1 + slot]) == sequence and int(self._header[0]) == version:
+                    return values, version
+            time.sleep(0)
+        raise shared_snapshot_Exception(f"No consistent snapshot of {self._name} after {retries} attempts.")
+
+    def is_valid(self, version: int) -> bool:
+        """*check that the slot of a snapshot read without copy has not been overwritten since*"""
+        # the slot of version v has been written (v + 1) // 2 times, each write adds 2 to its sequence number
+        return int(self._header[1 + version % 2]) == 2 * ((version + 1) // 2)
+
+    def close(self) -> None:
+        """*detach the shared memory, and destroy it if this is the producer*
+
+        The shared memory cannot be detached while records read without copy are still referenced:
+        shared_snapshot_Exception is then raised, and the snapshot_buffer stays usable.
+        """
+        self._header = None
+        self._slots = None
+        try:
+            self._shm.close()
+        except BufferError:
+            self._map()
+            raise shared_snapshot_Exception(f"{self._name} cannot be closed, records read without copy are still referenced.") from None
+        if self._create:
+            self._shm.unlink()
+
+
+def create_shared_memory(name: str, size: int, capacity: int) -> shared_memory.SharedMemory:
+    """*create the shared memory of a producer, or take over the one left by a previous producer*
+
+    If a previous producer was killed, its shared memory is reused when it has the same capacity, so that
+    the consumers attached to it keep working. Otherwise it is replaced, and the consumers should be restarted.
+    output:
+        the shared memory, with its header initialized
+    """
+    try:
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    except FileExistsError:
+        shm = shared_memory.SharedMemory(name=name)
+        header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=shm.buf)
+        if shm.size >= size and header[5] == capacity:
+            logging.warning(f"The shared snapshot {name} left by a previous producer is reused.")
+            # a slot may have been left being written, restore the sequence numbers of the published versions
+            version = int(header[0])
+            for slot in (0, 1):
+                last_version = version if version % 2 == slot else max(version - 1, 0)
+                header[1 + slot] = 2 * ((last_version + 1) // 2)
+            del header
+            return shm
+        logging.warning(f"The shared snapshot {name} left by a previous producer has another capacity, it is replaced.")
+        del header
+        shm.close()
+        shm.unlink()
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=shm.buf)
+    header[:] = 0
+    header[5] = capacity
+    return shm
+
+
+# whether this process shares the resource tracker of the producer, found at the first attach
+_tracker_shared = None
+
+
+def attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """*attach an existing shared memory without letting the resource tracker destroy it at exit*"""
+    global _tracker_shared
+    try:
+        try:
+            return shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # before python 3.13, the consumers are registered to the resource tracker as well.
+            # A consumer started by multiprocessing from the producer (fork or spawn), or running in the producer
+            # process, shares the tracker of the producer: it should not unregister, otherwise the tracker loses
+            # the segments of the producer. A tracker already running at the first attach is such a shared one.
+            if _tracker_shared is None:
+                _tracker_shared = resource_tracker._resource_tracker._fd is not None
+            shm = shared_memory.SharedMemory(name=name)
+            if not _tracker_shared:
+                resource_tracker.unregister(shm._name, "shared_memory")
+            return shm
+    except FileNotFoundError:
+        logging.error(f"The shared snapshot {name} is not available, is the producer running?")
+        raise
+
+
+def close_buffers(buffers: dict[str, snapshot_buffer]) -> None:
+    """*close all the buffers and remove them from the dict*
+
+    The buffers which cannot be closed yet are kept in the dict, and shared_snapshot_Exception is raised.
+    """
+    for key in list(buffers):
+        try:
+            buffers[key].close()
+        except shared_snapshot_Exception as e:
+            logging.error(e)
+            continue
+        del buffers[key]
+    if buffers:
+        raise shared_snapshot_Exception(f"{list(buffers)} cannot be closed, records read without copy are still referenced.")
+
+
+class snapshot_producer():
+    """*snapshot_producer class*
+
+    The single process talking to the upstream APIs. Each refresh fetches the latest prices, the klines
+    (with signals and scores) and the weather, and publishes them into the shared snapshots named after prefix.
+    """
+    def __init__(self, prefix: str = "hinfo", ticker: crypto_caller.latest_price_Binance = None, klines: list = [], weather=None, max_symbols: int = 64, weather_nbytes: int = 262144):
+        """*Initialize the snapshot_producer class*
+
+        parameters:
+            prefix: the prefix of the shared memory names, shared with the consumers
+            ticker: the latest_price_Binance to publish, if any
+            klines: the Binance_kline to publish
+            weather: the API_caller.weather_API to publish (current weather and forecast), if any
+            max_symbols: the capacity of the latest price snapshot
+            weather_nbytes: the capacity of the weather snapshots, in bytes of JSON
+        """
+        self._prefix = prefix
+        self._ticker = ticker
+        self._klines = klines
+        self._weather = weather
+        self._buffers = {}
+        if ticker is not None:
+            self._buffers["price"] = snapshot_buffer(f"{prefix}_price", PRICE_DTYPE, max_symbols, create=True)
+        for kline in klines:
+            self._buffers[f"kline_{kline._symbol}"] = snapshot_buffer(f"{prefix}_kline_{kline._symbol}", KLINE_DTYPE, kline._buffer.capacity, create=True)
+        if weather is not None:
+            self._buffers["weather_current"] = snapshot_buffer(f"{prefix}_weather_current", JSON_DTYPE, weather_nbytes, create=True)
+            self._buffers["weather_forecast"] = snapshot_buffer(f"{prefix}_weather_forecast", JSON_DTYPE, weather_nbytes, create=True)
+        logging.debug(f"snapshot_producer object created: {self}")
+
+    def __str__(self) -> str:
+        return f"snapshot_producer(prefix={self._prefix}, snapshots={list(self._buffers)})"
+
+    def publish_json(self, key: str, data: dict) -> int:
+        """*publish a JSON-serializable dict into the snapshot key*"""
+        payload = np.frombuffer(json.dumps(data).encode(), dtype=JSON_DTYPE)
+        if len(payload) > self._buffers[key].capacity:
+            raise shared_snapshot_Exception(f"{key} needs {len(payload)} bytes, more than the capacity {self._buffers[key].capacity}.")
+        return self._buffers[key].publish(payload)
+
+    def refresh(self) -> None:
+        """*fetch all the data from the upstream APIs once, and publish them*"""
+        if self._ticker is not None:
+            prices = self._ticker.show_latest_price()
+            self._buffers["price"].publish(np.array([(symbol.encode(), float(price)) for symbol, price in prices.items()], dtype=PRICE_DTYPE))
+        for kline in self._klines:
+            # the views of the buffer are enough, its records are published
+            kline.get_kline_data(copy=False)
+            kline.evaluate_signal_score(copy=False)
+            self._buffers[f"kline_{kline._symbol}"].publish(kline._buffer.records())
+        if self._weather is not None:
+            self.publish_json("weather_current", self._weather.get_current_weather())
+            self.publish_json("weather_forecast", self._weather.get_forecast())
+
+    def run(self, period: float = 60) -> None:
+        """*refresh every period seconds, until interrupted*
+
+        The upstream errors and the payloads too large for their snapshot are logged,
+        and the consumers keep reading the last snapshots.
+        """
+        try:
+            while True:
+                try:
+                    self.refresh()
+                except (API_caller_Exception, requests.RequestException, shared_snapshot_Exception) as e:
+                    logging.error(f"Error refreshing the shared snapshots: {e}")
+                time.sleep(period)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """*destroy all the shared snapshots*"""
+        close_buffers(self._buffers)
+
+
+class snapshot_consumer():
+    """*snapshot_consumer class*
+
+    Read the snapshots published by a snapshot_producer with the same prefix, without any request to the APIs.
+    The snapshots are attached on first use.
+    """
+    def __init__(self, prefix: str = "hinfo"):
+        """*Initialize the snapshot_consumer class*"""
+        self._prefix = prefix
+        self._buffers = {}
+        logging.debug(f"snapshot_consumer object created: {self}")
+
+    def __str__(self) -> str:
+        return f"snapshot_consumer(prefix={self._prefix})"
+
+    def _buffer(self, key: str, dtype: np.dtype) -> snapshot_buffer:
+        # a snapshot not initialized by the producer yet raises, and is attached again on the next use
+        if key not in self._buffers:
+            self._buffers[key] = snapshot_buffer(f"{self._prefix}_{key}", dtype)
+        return self._buffers[key]
+
+    def latest_price(self) -> dict[str, float]:
+        """*get the latest price of the crypto currencies, as latest_price_Binance.show_latest_price*"""
+        records, _ = self._buffer("price", PRICE_DTYPE).read(copy=True)
+        return {symbol.decode(): price for symbol, price in zip(records["symbol"], records["price"].tolist())}
+
+    def kline_records(self, symbol: str, copy: bool = False) -> tuple[np.ndarray, int]:
+        """*get the kline records of a symbol and the version of the snapshot*
+
+        Without copy, the records are a view of the shared memory, to be checked with is_valid(symbol, version)
+        if they are used longer than a refresh period.
+        """
+        return self._buffer(f"kline_{symbol}", KLINE_DTYPE).read(copy=copy)
+
+    def kline_frame(self, symbol: str, copy: bool = True) -> pd.DataFrame:
+        """*get the kline data, indicators, flags and scores of a symbol as a DataFrame indexed by open_time*
+
+        Without copy, the DataFrame is a view of the shared memory, as kline_records.
+        """
+        records, _ = self.kline_records(symbol, copy=copy)
+        values = records.view(np.float64).reshape(len(records), len(KLINE_DTYPE.names))
+        index = pd.to_datetime(values[:, 0], unit='ms')
+        index.name = KLINE_DTYPE.names[0]
+        return pd.DataFrame(values[:, 1:], index=index, columns=list(KLINE_DTYPE.names[1:]), copy=False)
+
+    def is_valid(self, symbol: str, version: int) -> bool:
+        """*check that the kline records of a symbol read without copy are still valid*"""
+        return self._buffer(f"kline_{symbol}", KLINE_DTYPE).is_valid(version)
+
+    def current_weather(self) -> dict:
+        """*get the current weather, as weather_API.get_current_weather*"""
+        payload, _ = self._buffer("weather_current", JSON_DTYPE).read(copy=True)
+        return json.loads(payload.tobytes())
+
+    def forecast(self) -> dict:
+        """*get the forecast, as weather_API.get_forecast*"""
+        payload, _ = self._buffer("weather_forecast", JSON_DTYPE).read(copy=True)
+        return json.loads(payload.tobytes())
+
+    def close(self) -> None:
+        """*detach all the shared snapshots*
+
+        The frames and records read without copy should be dropped before, see snapshot_buffer.close.
+        """
+        close_buffers(self._buffers)
+
+# End of file
@@ -9,6 +9,9 @@
         The dividend data could be easily obtained from https://www.bnains.org/index.php.
         For this very first version, we only consider the price and the dividend, and to calculate the 
         RoI_annual (annual return on investment) and annual standard deviation.
+        The csv files are converted once into a pair of .npy files (int64 dates and float64 values),
+        which are then opened via memory-mapping. The conversion is redone when the csv file is newer.
+        The data is indexed by a DatetimeIndex, and the dates given as str are in the format DD/MM/YYYY.
 
         !!todo: IRR (internal rate of return)
 """
@@ -23,6 +26,114 @@ import numpy as np
 import pandas as pd
 
 # import private packages
+import instrumentation
+
+
+PRICE_COLUMNS = ["open", "high", "low", "closing", "volume"]
+DIVIDEND_COLUMNS = ["dividende"]
+DATE_FORMAT = "%d/%m/%Y"
+DRAWDOWN_CHUNK_SIZE = 262144 # number of prices processed at once by rolling_metrics for the drawdown
+
+
+def get_data_path() -> str:
+    """*get the path of the folder data*
+
+    Start from the current path, and go to the parent path until the folder data is found.
+    """
+    current_path = os.getcwd()
+    while "data" not in os.listdir(current_path):
+        parent_path = os.path.dirname(current_path)
+        if parent_path == current_path:
+            raise FileNotFoundError("The folder data is not found.")
+        current_path = parent_path
+    return os.path.join(current_path, "data")
+
+
+def binary_paths(csv_path: str) -> tuple[str, str]:
+    """*get the paths of the .npy pair associated to a csv file*
+
+    output:
+        the path of the dates file (int64, days since epoch) and the path of the values file (float64)
+    """
+    base_path = os.path.splitext(csv_path)[0]
+    return base_path + "_date.npy", base_path + "_value.npy"
+
+
+def save_binary(df: pd.DataFrame, csv_path: str, columns: list[str]) -> bool:
+    """*save the dataframe into the .npy pair associated to the csv file*
+
+    The index should be dates in the format DD/MM/YYYY, and the columns should be exactly the given columns.
+    output:
+        True if the binary files are written, False if the dataframe cannot be stored as binary
+    """
+    if list(df.columns) != columns:
+        logging.warning("The columns of {} are not {}, binary conversion skipped.".format(csv_path, columns))
+        return False
+    try:
+        dates = pd.to_datetime(df.index, format=DATE_FORMAT)
+    except (ValueError, TypeError):
+        logging.warning("The dates of {} are not in the format {}, binary conversion skipped.".format(csv_path, DATE_FORMAT))
+        return False
+    date_path, value_path = binary_paths(csv_path)
+    arrays = {
+        date_path: dates.values.astype("datetime64[D]").astype(np.int64),
+        value_path: np.ascontiguousarray(df.to_numpy(dtype=np.float64)),
+    }
+    for path, array in arrays.items():
+        # write into a temporary file first, so that a reader never sees a partial file
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, array)
+        os.replace(path + ".tmp", path)
+    return True
+
+
+def load_table(csv_path: str, columns: list[str]) -> pd.DataFrame:
+    """*load the price or dividend data stored in a csv file*
+
+    The data is read from the memory-mapped .npy pair if it is up to date, otherwise the csv file is parsed
+    and converted. The values are mapped in copy-on-write mode, so that the files are never modified.
+    parameters:
+        csv_path: the path of the csv file
+        columns: the expected columns of the csv file
+    output:
+        the dataframe indexed by a DatetimeIndex, or by the dates as str if they are not in the format DD/MM/YYYY
+    """
+    date_path, value_path = binary_paths(csv_path)
+    csv_mtime = os.path.getmtime(csv_path)
+    is_fresh = all(os.path.exists(path) and os.path.getmtime(path) >= csv_mtime for path in (date_path, value_path))
+    instrumentation.count("stock_binary_cache_total", result="hit" if is_fresh else "miss")
+    if not is_fresh:
+        df = pd.read_csv(csv_path, index_col=0)
+        if not save_binary(df, csv_path, columns):
+            return parse_index(df)
+        logging.info("{} converted into {} and {}.".format(csv_path, date_path, value_path))
+    dates = np.load(date_path, mmap_mode="r")
+    values = np.load(value_path, mmap_mode="c")
+    if values.shape != (len(dates), len(columns)):
+        # inconsistent pair, e.g. interrupted conversion, then go back to the csv file
+        logging.warning("The binary data of {} is corrupted, read from csv.".format(csv_path))
+        df = pd.read_csv(csv_path, index_col=0)
+        save_binary(df, csv_path, columns)
+        return parse_index(df)
+    # the index is built from the int64 days without formatting any str
+    index = pd.DatetimeIndex(dates.astype("datetime64[D]"), name="date")
+    return pd.DataFrame(values, index=index, columns=columns, copy=False)
+
+
+def parse_index(df: pd.DataFrame) -> pd.DataFrame:
+    """*convert the index of a dataframe read from csv into a DatetimeIndex, if the dates are in the format DD/MM/YYYY*"""
+    try:
+        df.index = pd.DatetimeIndex(pd.to_datetime(df.index, format=DATE_FORMAT), name=df.index.name)
+    except (ValueError, TypeError):
+        pass
+    return df
+
+
+def to_date(date) -> pd.Timestamp:
+    """*convert a date given as str in the format DD/MM/YYYY (or as a Timestamp) into a Timestamp*"""
+    if isinstance(date, str):
+        return pd.to_datetime(date, format=DATE_FORMAT)
+    return pd.Timestamp(date)
 
 
 class stock_analyser:
@@ -30,58 +141,59 @@ class stock_analyser:
         """*initialize the stock analyser*
         """
         self._stock_name = stock_name
-        # read the stock data from the csv file
-        # first check the current path
-        current_path = os.getcwd()
-        # then get the path of the stock data, if /data is not in the current path, then go to the parent path
-        while "data" not in os.listdir(current_path):
-            current_path = os.path.dirname(current_path)
+        # read the stock data from the folder data
+        data_path = get_data_path()
         # check if the stock data is available
-        if stock_name + "_price.csv" not in os.listdir(os.path.join(current_path, "data")):
+        if stock_name + "_price.csv" not in os.listdir(data_path):
             logging.error("The stock data of {} is not available.".format(stock_name))
             logging.error("Please download the stock data from Boursorama and proceed the data extraction. via [A FUNCTION TO BE DEFINED]")
             raise FileNotFoundError("The stock data of {} is not available.".format(stock_name))
         # get the path of the stock data
-        self._stock_price = pd.read_csv(os.path.join(current_path, "data", stock_name + "_price.csv"), index_col=0)
+        self._stock_price = load_table(os.path.join(data_path, stock_name + "_price.csv"), PRICE_COLUMNS)
         # get the path of the stock dividend
-        stock_dividend_path = os.path.join(current_path, "data", stock_name + "_dividende.csv")
+        stock_dividend_path = os.path.join(data_path, stock_name + "_dividende.csv")
         if os.path.exists(stock_dividend_path):
-            self._stock_dividend = pd.read_csv(stock_dividend_path, index_col=0)
+            self._stock_dividend = load_table(stock_dividend_path, DIVIDEND_COLUMNS)
         else:
             self._stock_dividend = {"None": None}
             logging.warning("The dividend data of {} is not available.".format(stock_name))
 
 
+    @instrumentation.timed("stock_roi")
     def RoI(self, start_date: str = "03/01/2022", end_date: str = "LAST"):
         """*calculate the RoI (return on investment)*
         """
         if end_date == "LAST":
             end_date = self._stock_price.index[-1]
+        start_date, end_date = to_date(start_date), to_date(end_date)
         # total number of days
-        nb_days = (pd.to_datetime(end_date) - pd.to_datetime(start_date)).days
+        nb_days = (end_date - start_date).days
         # total dividende after date_begin
         d = 0
         for date in self._stock_dividend.index:
-            if pd.to_datetime(date) > pd.to_datetime(start_date):
+            if to_date(date) > start_date:
                 d += self._stock_dividend.loc[date, "dividende"]
         RoI_annual = ((self._stock_price.loc[end_date, "closing"] + d) / self._stock_price.loc[start_date, "closing"]) ** (365 / nb_days) - 1
         self._RoI_annual = RoI_annual
         return RoI_annual
 
 
+    @instrumentation.timed("stock_sd")
     def SD(self, start_date: str = "03/01/2022", end_date: str = "LAST"):
         """*calculate the standard deviation*
 
-        TODO: this SD should be normalized or not?
+        This SD is the dispersion of the adjusted price itself, hence not normalized by the price level.
+        For the normalized version (volatility of the log returns), see rolling_metrics.
         """
         if end_date == "LAST":
             end_date = self._stock_price.index[-1]
+        start_date, end_date = to_date(start_date), to_date(end_date)
         # total number of days
-        nb_days = (pd.to_datetime(end_date) - pd.to_datetime(start_date)).days
+        nb_days = (end_date - start_date).days
         # adjust the price by the dividendes
         self._stock_price["closing_adj"] = self._stock_price["closing"]
         for date in self._stock_dividend.index:
-            if pd.to_datetime(date) > pd.to_datetime(start_date):
+            if to_date(date) > start_date:
                 self._stock_price.loc[:date, "closing_adj"] -= self._stock_dividend.loc[date, "dividende"]
         # calculate the mean price
         mean_price = self._stock_price.loc[start_date:end_date, "closing_adj"].mean()
@@ -99,6 +211,80 @@ class stock_analyser:
         return self.RoI(start_date, end_date), *self.SD(start_date, end_date)
 
 
+    def adjusted_closing(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """*get the closing price adjusted by the dividends, sorted by date*
+
+        Each dividend multiplies the prices up to its date by (1 - dividend / closing price of that date),
+        i.e. the dividend is reinvested, so that the log returns are not biased by the detachment.
+        output:
+            the dates (datetime64), the order applied to self._stock_price, and the adjusted closing prices
+        """
+        dates = self._stock_price.index.values
+        order = np.argsort(dates, kind="stable")
+        dates = dates[order]
+        closing = self._stock_price["closing"].to_numpy(dtype=np.float64)[order]
+        factor = np.ones(len(closing))
+        if isinstance(self._stock_dividend, pd.DataFrame):
+            # the template date "DD/MM/YYYY" is ignored
+            dividend_dates = pd.to_datetime(self._stock_dividend.index, format=DATE_FORMAT, errors="coerce").values.astype(dates.dtype)
+            dividend = self._stock_dividend["dividende"].to_numpy(dtype=np.float64)
+            valid = ~np.isnat(dividend_dates)
+            # position of the last price on or before each dividend date
+            positions = np.searchsorted(dates, dividend_dates[valid], side="right") - 1
+            dividend = dividend[valid][positions >= 0]
+            positions = positions[positions >= 0]
+            np.multiply.at(factor, positions, 1 - dividend / closing[positions])
+        # a dividend affects all the prices before its date, hence the cumulative product from the end
+        factor = np.cumprod(factor[::-1])[::-1]
+        return dates, order, closing * factor
+
+
+    @instrumentation.timed("stock_rolling_metrics")
+    def rolling_metrics(self, window: int = 252, risk_free_rate: float = 0.0) -> pd.DataFrame:
+        """*calculate the rolling risk metrics over the whole history*
+
+        For each date, the metrics are calculated over the last window log returns of the adjusted closing price.
+        The return and the volatility are obtained in O(n) via cumulative sums, and annualized with the number
+        of calendar days of the window, as in RoI. The maximum drawdown is O(n * window), vectorized over chunks
+        of windows holding at most DRAWDOWN_CHUNK_SIZE prices, so that the temporary arrays stay a few MB.
+        parameters:
+            window: the number of returns in each window, e.g. 252 for about one year of trading days
+            risk_free_rate: the annual risk-free rate used for the Sharpe ratio
+        output:
+            a DataFrame indexed by date, with columns "return_annual", "volatility_annual", "max_drawdown"
+            and "sharpe". The first window dates are NaN.
+        """
+        dates, order, closing_adj = self.adjusted_closing()
+        if not 2 <= window < len(closing_adj):
+            raise ValueError("window should be between 2 and {}, not {}".format(len(closing_adj) - 1, window))
+        log_return = np.diff(np.log(closing_adj))
+        # cumulative sums with a leading zero, so that the sum over a window is a difference
+        cumsum = np.concatenate(([0.0], np.cumsum(log_return)))
+        cumsum_sq = np.concatenate(([0.0], np.cumsum(log_return ** 2)))
+        sum_window = cumsum[window:] - cumsum[:-window]
+        sum_sq_window = cumsum_sq[window:] - cumsum_sq[:-window]
+        nb_days = (dates[window:] - dates[:-window]) / np.timedelta64(1, "D")
+        # annualized return
+        return_annual = np.exp(sum_window * 365 / nb_days) - 1
+        # annualized volatility of the log returns, with window returns observed in nb_days
+        variance = np.maximum(sum_sq_window - sum_window ** 2 / window, 0) / (window - 1)
+        volatility_annual = np.sqrt(variance * window * 365 / nb_days)
+        # maximum drawdown over the window + 1 prices of each window, by chunks of windows to bound the memory
+        prices = np.lib.stride_tricks.sliding_window_view(closing_adj, window + 1)
+        chunk = max(DRAWDOWN_CHUNK_SIZE // (window + 1), 1)
+        max_drawdown = np.concatenate([(1 - prices[i:i + chunk] / np.maximum.accumulate(prices[i:i + chunk], axis=1)).max(axis=1)
+                                       for i in range(0, len(prices), chunk)])
+        sharpe = np.divide(return_annual - risk_free_rate, volatility_annual,
+                           out=np.full(len(volatility_annual), np.nan), where=volatility_annual > 0)
+        # align the metrics with the dates, the first window dates have no complete window
+        metrics = {"return_annual": return_annual, "volatility_annual": volatility_annual,
+                   "max_drawdown": max_drawdown, "sharpe": sharpe}
+        df = pd.DataFrame({name: np.concatenate((np.full(window, np.nan), values)) for name, values in metrics.items()},
+                          index=self._stock_price.index[order])
+        self._rolling_metrics = df
+        return df
+
+
 def treat_price(stock_name: str):
     """*treat the price data*
 
@@ -106,16 +292,13 @@ def treat_price(stock_name: str):
     The price data can be downloaded from https://www.boursorama.com/cours/[certain_stock]/ via the button "Télécharger les cotations".
     Remeber to select the period of time (up to 10 years can be obtained).
     """
-    current_path = os.getcwd()
-    # then get the path of the stock data, if /data is not in the current path, then go to the parent path
-    while "data" not in os.listdir(current_path):
-        current_path = os.path.dirname(current_path)
+    data_path = get_data_path()
     # get the path of the stock data with file name "[stock_name]_YYYY-MM-DD.txt"
-    for file_name in os.listdir(os.path.join(current_path, "data")):
+    for file_name in os.listdir(data_path):
         if stock_name in file_name and ".txt" in file_name:
             break
     # read the price data as a list of lines
-    with open(os.path.join(current_path, "data", file_name), "r") as f:
+    with open(os.path.join(data_path, file_name), "r") as f:
         lines = f.readlines()
 
     # extract the price and save them into dataframes
@@ -125,10 +308,12 @@ def treat_price(stock_name: str):
         line = line.split("\t")
         date = line[0][:-6]
         data[date] = [float(line[1]), float(line[2]), float(line[3]), float(line[4]), int(line[5])]
-    df = pd.DataFrame.from_dict(data, orient="index", columns=["open", "high", "low", "closing", "volume"])
+    df = pd.DataFrame.from_dict(data, orient="index", columns=PRICE_COLUMNS)
     df.index.name = "date"
-    # save the dataframe into csv file
-    df.to_csv(os.path.join(current_path, "data", stock_name + "_price.csv"))
+    # save the dataframe into csv file, and its binary version for the stock analyser
+    csv_path = os.path.join(data_path, stock_name + "_price.csv")
+    df.to_csv(csv_path)
+    save_binary(df, csv_path, PRICE_COLUMNS)
     return 1
 
 
@@ -139,14 +324,11 @@ def save_dividend(stock_name: str):
     Considering potential legal liabilities, I will not propose any way to extract the dividend data automatically.
     """
     dividend = {"DD/MM/YYYY": 0.00}
-    df = pd.DataFrame.from_dict(dividend, orient="index", columns=["dividende"])
+    df = pd.DataFrame.from_dict(dividend, orient="index", columns=DIVIDEND_COLUMNS)
     df.index.name = "date"
     # save the dataframe into csv file
-    current_path = os.getcwd()
-    # then get the path of the stock data, if /data is not in the current path, then go to the parent path
-    while "data" not in os.listdir(current_path):
-        current_path = os.path.dirname(current_path)
-    df.to_csv(os.path.join(current_path, "data", stock_name + "_dividende.csv"))
+    # the template is not converted into binary, this is done by the stock analyser once the dates are filled
+    df.to_csv(os.path.join(get_data_path(), stock_name + "_dividende.csv"))
     return 1
 
 # end of file
\ No newline at end of file